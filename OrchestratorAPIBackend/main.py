@@ -1,5 +1,12 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import json
@@ -7,6 +14,8 @@ import logging
 from datetime import datetime
 from pathlib import Path
 
+from store_dedup import dedupe_stores
+
 # Import Valyu service
 try:
     from valyu_service import ValyuSearchService, StoreResult
@@ -23,8 +32,165 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Output directory for saved requests (created on startup)
+OUTPUT_DIR = Path("output")
+
+def _env_number(name: str, default, cast=float):
+    """Read a numeric setting, falling back to the default if it is malformed."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        return cast(raw)
+    except ValueError:
+        logger.warning(f"Invalid {name}={raw!r}, using default {default}")
+        return default
+
+# Lifespan settings
+WORKER_THREADS = _env_number("WORKER_THREADS", 8, int)
+VALYU_WARMUP_PROBE = os.getenv("VALYU_WARMUP_PROBE", "0") == "1"
+WARMUP_TIMEOUT_SECONDS = _env_number("WARMUP_TIMEOUT_SECONDS", 10.0)
+# Seconds between SIGTERM and uvicorn's own shutdown, while /readyz reports 503
+# so the load balancer stops routing here. Keep this plus uvicorn's
+# --timeout-graceful-shutdown below fly.toml's kill_timeout.
+SHUTDOWN_DELAY_SECONDS = _env_number("SHUTDOWN_DELAY_SECONDS", 10.0)
+
+class AppContext:
+    """
+    Shared application state created on startup and torn down on shutdown.
+
+    Holds the Valyu service and a thread pool for blocking work (Valyu
+    searches, file writes), and counts in-flight work for /readyz.
+
+    On SIGTERM it marks itself as draining so /readyz returns 503, and only
+    hands the signal on to uvicorn after SHUTDOWN_DELAY_SECONDS. Requests that
+    arrive in that window are still served; uvicorn then stops listening and
+    waits for open requests before the lifespan shutdown closes the pool.
+    """
+
+    def __init__(self, shutdown_delay: float = SHUTDOWN_DELAY_SECONDS):
+        self.valyu_service: Optional["ValyuSearchService"] = None
+        self.executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="backend-worker")
+        self.shutdown_delay = shutdown_delay
+        self.ready = False
+        self.draining = False
+        self.in_flight = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._previous_sigterm = None
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking call on the shared thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    @asynccontextmanager
+    async def track(self):
+        """Count a unit of work as in flight."""
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def begin_drain(self):
+        """Report not-ready so no new traffic is routed here."""
+        if not self.draining:
+            logger.info(f"Draining: /readyz now returns 503 ({self.in_flight} request(s) in flight)")
+        self.ready = False
+        self.draining = True
+
+    def install_signal_handler(self):
+        """
+        Intercept SIGTERM ahead of uvicorn's handler.
+
+        Must run after uvicorn has installed its own handlers (lifespan
+        startup does). Signals can only be set from the main thread, so this
+        is a no-op elsewhere (e.g. under the test client).
+        """
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._previous_sigterm = signal.signal(signal.SIGTERM, self._handle_sigterm)
+        except ValueError:
+            self._previous_sigterm = None
+            logger.info("Not on the main thread; SIGTERM drain delay disabled")
+
+    def restore_signal_handler(self):
+        if self._previous_sigterm is not None:
+            signal.signal(signal.SIGTERM, self._previous_sigterm)
+            self._previous_sigterm = None
+
+    def _handle_sigterm(self, sig, frame):
+        if self.draining:
+            # A second SIGTERM skips the delay
+            self._forward_signal(sig, frame)
+            return
+        self.begin_drain()
+        self._loop.call_soon_threadsafe(self._loop.call_later, self.shutdown_delay, self._forward_signal, sig, frame)
+
+    def _forward_signal(self, sig, frame):
+        previous = self._previous_sigterm
+        if callable(previous):
+            previous(sig, frame)
+        else:
+            signal.signal(sig, previous if previous is not None else signal.SIG_DFL)
+            signal.raise_signal(sig)
+
+    async def startup(self):
+        """Create the output directory, initialize Valyu and optionally warm it up."""
+        OUTPUT_DIR.mkdir(exist_ok=True)
+        self.install_signal_handler()
+
+        if VALYU_AVAILABLE:
+            try:
+                self.valyu_service = ValyuSearchService()
+                logger.info("Valyu service initialized successfully")
+            except Exception as e:
+                logger.warning(f"Could not initialize Valyu service: {e}")
+                logger.warning("/api/findStores endpoint will return an error")
+
+        if self.valyu_service is not None and VALYU_WARMUP_PROBE:
+            await self._warm_up()
+
+        self.ready = True
+
+    async def _warm_up(self):
+        """Send a synthetic Valyu search so TLS connections are open before traffic arrives."""
+        try:
+            await asyncio.wait_for(
+                self.run(
+                    self.valyu_service.search_stores,
+                    part_to_acquire="copper pipe",
+                    location_postcode="SW1A 1AA",
+                    max_results=1,
+                ),
+                timeout=WARMUP_TIMEOUT_SECONDS,
+            )
+            logger.info("Valyu warm-up probe succeeded")
+        except Exception as e:
+            # A failed probe should not block startup; the first real request pays the cost instead
+            logger.warning(f"Valyu warm-up probe failed: {e}")
+
+    async def shutdown(self):
+        """Close the thread pool once uvicorn has finished serving requests, draining queued work."""
+        self.begin_drain()
+        self.restore_signal_handler()
+        # Queued searches and writes still run to completion (nothing is cancelled);
+        # waiting happens off the event loop so it does not block it
+        await asyncio.to_thread(self.executor.shutdown, wait=True, cancel_futures=False)
+        logger.info("Shutdown complete")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    context = AppContext()
+    app.state.context = context
+    await context.startup()
+    try:
+        yield
+    finally:
+        await context.shutdown()
+
 # Create FastAPI app
-app = FastAPI(title="LiveKit Agent API", version="1.0.0")
+app = FastAPI(title="LiveKit Agent API", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware to allow requests from LiveKit Agent
 app.add_middleware(
@@ -35,19 +201,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create output directory if it doesn't exist
-OUTPUT_DIR = Path("output")
-OUTPUT_DIR.mkdir(exist_ok=True)
+def get_app_context(request: Request) -> AppContext:
+    """Dependency returning the shared application context."""
+    return request.app.state.context
 
-# Initialize Valyu service (if available)
-valyu_service = None
-if VALYU_AVAILABLE:
-    try:
-        valyu_service = ValyuSearchService()
-        logger.info("Valyu service initialized successfully")
-    except Exception as e:
-        logger.warning(f"Could not initialize Valyu service: {e}")
-        logger.warning("/api/findStores endpoint will return an error")
+def get_valyu_service(context: AppContext = Depends(get_app_context)):
+    """Dependency returning the shared Valyu service, or 503 if it is unavailable."""
+    if context.valyu_service is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Valyu service is not available. Check VALYU_API_KEY is set."
+        )
+    return context.valyu_service
+
+def _write_json(filepath: Path, data: dict):
+    with open(filepath, 'w') as f:
+        json.dump(data, f, indent=2)
 
 # Pydantic model for the request body
 class ProcurePartRequest(BaseModel):
@@ -63,7 +232,7 @@ class FindStoresResponse(BaseModel):
     part_to_acquire: str
     location_postcode: str
 
-async def _procure_part_handler(request: ProcurePartRequest):
+async def _procure_part_handler(request: ProcurePartRequest, context: AppContext):
     """
     Internal handler for part procurement requests.
     """
@@ -83,9 +252,9 @@ async def _procure_part_handler(request: ProcurePartRequest):
             "location_postcode": request.location_postcode
         }
 
-        # Write to JSON file
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Write to JSON file on the worker pool so shutdown can drain it
+        async with context.track():
+            await context.run(_write_json, filepath, data)
 
         logger.info(f"Successfully saved request to {filepath}")
 
@@ -101,24 +270,28 @@ async def _procure_part_handler(request: ProcurePartRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.post("/api/procurePart")
-async def procure_part_camel(request: ProcurePartRequest):
+async def procure_part_camel(request: ProcurePartRequest, context: AppContext = Depends(get_app_context)):
     """
     Endpoint to receive part procurement requests from LiveKit Agent (camelCase URL).
     Saves the request data to a JSON file in the output directory.
     """
-    return await _procure_part_handler(request)
+    return await _procure_part_handler(request, context)
 
 @app.post("/api/procure_part")
-async def procure_part_snake(request: ProcurePartRequest):
+async def procure_part_snake(request: ProcurePartRequest, context: AppContext = Depends(get_app_context)):
     """
     Endpoint to receive part procurement requests from LiveKit Agent (snake_case URL).
     Saves the request data to a JSON file in the output directory.
     """
-    return await _procure_part_handler(request)
+    return await _procure_part_handler(request, context)
 
 @app.post("/api/findStores")
 @app.post("/api/find_stores")
-async def find_stores(request: ProcurePartRequest):
+async def find_stores(
+    request: ProcurePartRequest,
+    context: AppContext = Depends(get_app_context),
+    valyu_service=Depends(get_valyu_service),
+):
     """
     Find stores selling a specific part near a UK postcode using Valyu API.
 
@@ -129,37 +302,52 @@ async def find_stores(request: ProcurePartRequest):
         request: Contains part_to_acquire and location_postcode
 
     Returns:
-        List of stores with name, URL, and content/description
+        List of stores with name, URL, and content/description, and the
+        number of duplicate results merged away (scrapes/calls saved)
     """
     try:
-        # Check if Valyu service is available
-        if not VALYU_AVAILABLE or valyu_service is None:
-            raise HTTPException(
-                status_code=503,
-                detail="Valyu service is not available. Check VALYU_API_KEY is set."
-            )
-
         # Log the incoming request
         logger.info(f"Finding stores for: {request.model_dump()}")
 
-        # Call Valyu search service
-        stores = valyu_service.search_stores(
-            part_to_acquire=request.part_to_acquire,
-            location_postcode=request.location_postcode,
-            max_results=10
-        )
+        # Call Valyu search service on the worker pool so the event loop stays free
+        async with context.track():
+            stores = await context.run(
+                valyu_service.search_stores,
+                part_to_acquire=request.part_to_acquire,
+                location_postcode=request.location_postcode,
+                max_results=10,
+                dedupe=False
+            )
 
-        logger.info(f"Found {len(stores)} stores for {request.part_to_acquire} near {request.location_postcode}")
+        # Merge duplicate results so each store is scraped and called once
+        stores, duplicates_merged = dedupe_stores(stores)
 
-        return {
+        logger.info(
+            f"Found {len(stores)} stores for {request.part_to_acquire} near {request.location_postcode} "
+            f"({duplicates_merged} duplicate results merged)"
+        )
+
+        response = {
             "status": "success",
             "message": f"Found {len(stores)} stores",
             "total_stores": len(stores),
+            "duplicates_merged": duplicates_merged,
             "stores": stores,
             "part_to_acquire": request.part_to_acquire,
             "location_postcode": request.location_postcode
         }
 
+        # Save the results so store histories can be exported to snapshots.
+        # This is best effort: a failed save must not fail a successful search.
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        try:
+            async with context.track():
+                await context.run(_write_json, OUTPUT_DIR / f"find_stores_{timestamp}.json", response)
+        except Exception as e:
+            logger.warning(f"Could not save findStores results: {e}")
+
+        return response
+
     except ValueError as e:
         # Validation errors (invalid postcode, missing fields, etc.)
         logger.error(f"Validation error: {str(e)}")
@@ -176,13 +364,29 @@ async def find_stores(request: ProcurePartRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/")
-async def root():
+async def root(context: AppContext = Depends(get_app_context)):
     """Health check endpoint"""
     return {
         "status": "ok",
         "message": "LiveKit Agent API is running",
-        "valyu_available": VALYU_AVAILABLE and valyu_service is not None
+        "valyu_available": context.valyu_service is not None
+    }
+
+@app.get("/healthz")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness(context: AppContext = Depends(get_app_context)):
+    """Readiness probe: 503 once SIGTERM has been received and the server is draining"""
+    body = {
+        "status": "ready" if context.ready else "not_ready",
+        "draining": context.draining,
+        "in_flight": context.in_flight,
+        "valyu_available": context.valyu_service is not None
     }
+    return JSONResponse(status_code=200 if context.ready else 503, content=body)
 
 @app.get("/api/procurePart/list")
 async def list_requests():
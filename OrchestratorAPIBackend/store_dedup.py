@@ -0,0 +1,243 @@
+"""
+Deduplication of store search results.
+Valyu often returns several URLs for the same store (branch page, product page,
+map listing). This module groups them so each store is scraped and called once.
+"""
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+PHONE_PATTERN = re.compile(r"(\+?\d[\d\s().-]{7,}\d)")
+POSTCODE_PATTERN = re.compile(r"\b(GIR ?0AA|[A-Z]{1,2}\d{1,2}[A-Z]?\s*\d[A-Z]{2})\b", re.IGNORECASE)
+
+# Words that appear in listing titles but say nothing about which store it is
+NAME_NOISE_WORDS = {
+    "the", "ltd", "limited", "plc", "uk", "co", "com", "www",
+    "google", "maps", "map", "yell", "directions", "opening", "hours",
+}
+
+SHINGLE_SIZE = 3
+MINHASH_PERMUTATIONS = 32
+LSH_BANDS = 8
+NAME_SIMILARITY_THRESHOLD = 0.8
+# A shared phone number only merges results whose names are at least this similar
+# (or that are on the same host)
+PHONE_NAME_SIMILARITY_THRESHOLD = 0.5
+# UK national numbers: geographic (01, 02), non-geographic (03, 08) and mobile (07)
+UK_PHONE_PATTERN = re.compile(r"0[12378]\d{8,9}")
+# Only geographic and mobile numbers identify a single branch; 03/08 numbers
+# are usually a chain's national helpline listed on every branch page
+BRANCH_PHONE_PREFIXES = ("01", "02", "07")
+# Query parameters that only track where a click came from; every other
+# parameter is kept because it can identify the listing (?cid=, ?store=)
+TRACKING_PARAMS = {"ref", "gclid", "fbclid", "msclkid", "yclid", "dclid", "igshid", "mc_cid", "mc_eid", "srsltid", "_ga"}
+TRACKING_PARAM_PREFIXES = ("utm_",)
+_MERSENNE_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (1 + 2 * seed * 0x9E3779B1 % _MERSENNE_PRIME, seed * 0x85EBCA77 % _MERSENNE_PRIME)
+    for seed in range(1, MINHASH_PERMUTATIONS + 1)
+]
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalize a URL for identity comparison.
+
+    Drops scheme, "www.", fragment, trailing slash and tracking parameters
+    (utm_*, ref, gclid, ...). The remaining query parameters are kept, sorted,
+    because listings such as maps.google.com/?cid=... are told apart by them.
+    """
+    cleaned = url.strip()
+    if not cleaned:
+        return ""
+    parts = urlsplit(cleaned if "://" in cleaned else f"//{cleaned}")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    key = f"{host}{parts.path.rstrip('/').lower()}"
+    params = sorted(
+        (name.lower(), value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    return f"{key}?{urlencode(params)}" if params else key
+
+
+def normalize_phone(text: str) -> Optional[str]:
+    """
+    Find the first valid UK phone number in text, as bare national digits.
+
+    Digit runs that are not UK numbers (dates, times, prices) are skipped.
+    Returns None if no valid number is found.
+    """
+    for match in PHONE_PATTERN.finditer(text or ""):
+        digits = re.sub(r"\D", "", match.group(1))
+        if digits.startswith("440"):
+            digits = digits[2:]
+        elif digits.startswith("44"):
+            digits = "0" + digits[2:]
+        if UK_PHONE_PATTERN.fullmatch(digits):
+            return digits
+    return None
+
+
+def normalize_postcode(text: str) -> Optional[str]:
+    """Find the first UK postcode in text, uppercased without spaces."""
+    match = POSTCODE_PATTERN.search(text or "")
+    return re.sub(r"\s", "", match.group(1)).upper() if match else None
+
+
+def is_branch_phone(phone: Optional[str]) -> bool:
+    """True if the number is geographic or mobile, so it identifies one store."""
+    return bool(phone) and phone.startswith(BRANCH_PHONE_PREFIXES)
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a store name and strip punctuation and listing noise words."""
+    tokens = re.findall(r"[a-z0-9]+", (name or "").lower())
+    return " ".join(token for token in tokens if token not in NAME_NOISE_WORDS)
+
+
+def name_shingles(name: str) -> set:
+    """Character shingles of a normalized store name."""
+    normalized = normalize_name(name)
+    if len(normalized) < SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def _minhash(shingles: Iterable[str]) -> List[int]:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for shingle in shingles
+    ]
+    return [min((a * value + b) % _MERSENNE_PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _UnionFind:
+    def __init__(self, phones: List[Optional[str]], postcodes: List[Optional[str]]):
+        self.parent = list(range(len(phones)))
+        self.phone = list(phones)
+        self.postcode = list(postcodes)
+
+    def find(self, index: int) -> int:
+        while self.parent[index] != index:
+            self.parent[index] = self.parent[self.parent[index]]
+            index = self.parent[index]
+        return index
+
+    def conflict(self, a: int, b: int) -> bool:
+        """True if the two groups have different branch phones or different postcodes."""
+        root_a, root_b = self.find(a), self.find(b)
+        for values in (self.phone, self.postcode):
+            value_a, value_b = values[root_a], values[root_b]
+            if value_a and value_b and value_a != value_b:
+                return True
+        return False
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # Keep the earliest (highest ranked) result as the group root
+            root, child = min(root_a, root_b), max(root_a, root_b)
+            self.parent[child] = root
+            self.phone[root] = self.phone[root] or self.phone[child]
+            self.postcode[root] = self.postcode[root] or self.postcode[child]
+
+
+def dedupe_stores(stores: List[dict]) -> Tuple[List[dict], int]:
+    """
+    Merge search results that refer to the same store.
+
+    Results are grouped when they share a canonical URL, or a near-identical
+    name (MinHash LSH over name shingles, verified by exact Jaccard
+    similarity). A shared phone number also groups them, but only if it is a
+    branch (geographic or mobile) number and the results are on the same host
+    or have similar names; national 03/08 helplines shared by every branch of
+    a chain are never used. No merge happens when the two groups already have
+    different branch numbers or different postcodes, so branches of a chain
+    with identical page titles stay apart.
+    Indexing is hash-based, so the cost is near-linear in the number of results.
+
+    Args:
+        stores: Search results with name, url and content (original ranking order)
+
+    Returns:
+        Tuple of (merged results in original order, number of results merged away)
+    """
+    phones = [normalize_phone(store.get("phone") or store.get("content", "")) for store in stores]
+    branch_phones = [phone if is_branch_phone(phone) else None for phone in phones]
+    postcodes = [normalize_postcode(store.get("content", "")) for store in stores]
+    groups = _UnionFind(branch_phones, postcodes)
+    seen_urls: Dict[str, int] = {}
+    seen_phones: Dict[str, List[int]] = {}
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    shingles = [name_shingles(store.get("name", "")) for store in stores]
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+
+    url_keys = [canonical_url(store.get("url", "")) for store in stores]
+    hosts = [re.split(r"[/?]", url_key, 1)[0] for url_key in url_keys]
+
+    for index in range(len(stores)):
+        url_key = url_keys[index]
+        if url_key:
+            if url_key in seen_urls:
+                if not groups.conflict(seen_urls[url_key], index):
+                    groups.union(seen_urls[url_key], index)
+            else:
+                seen_urls[url_key] = index
+
+        phone = branch_phones[index]
+        if phone:
+            for other in seen_phones.setdefault(phone, []):
+                if groups.conflict(other, index):
+                    continue
+                same_host = bool(hosts[index]) and hosts[index] == hosts[other]
+                if same_host or _jaccard(shingles[other], shingles[index]) >= PHONE_NAME_SIMILARITY_THRESHOLD:
+                    groups.union(other, index)
+            seen_phones[phone].append(index)
+
+        if not shingles[index]:
+            continue
+        signature = _minhash(shingles[index])
+        for band in range(LSH_BANDS):
+            bucket = buckets.setdefault((band, tuple(signature[band * rows:(band + 1) * rows])), [])
+            for other in bucket:
+                if groups.find(other) == groups.find(index) or groups.conflict(other, index):
+                    continue
+                if _jaccard(shingles[other], shingles[index]) >= NAME_SIMILARITY_THRESHOLD:
+                    groups.union(other, index)
+            bucket.append(index)
+
+    merged: Dict[int, dict] = {}
+    for index, store in enumerate(stores):
+        root = groups.find(index)
+        if root not in merged:
+            merged[root] = {**store, "aliases": []}
+            continue
+        _merge_into(merged[root], store)
+
+    results = [merged[root] for root in sorted(merged)]
+    return results, len(stores) - len(results)
+
+
+def _merge_into(target: dict, duplicate: dict) -> None:
+    """Fold a duplicate result's fields into the group's primary result."""
+    url = duplicate.get("url", "")
+    if url and url != target.get("url") and url not in target["aliases"]:
+        target["aliases"].append(url)
+    for key, value in duplicate.items():
+        if key in ("url", "aliases") or not value:
+            continue
+        current = target.get(key)
+        if not current:
+            target[key] = value
+        elif key == "content" and value not in current:
+            target[key] = f"{current}\n{value}"
@@ -0,0 +1,108 @@
+import asyncio
+import signal
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+class FakeValyuService:
+    def search_stores(self, part_to_acquire, location_postcode, max_results=10, dedupe=True):
+        return [
+            {"name": "Acme Plumbing", "url": "https://acme.co.uk/branch/", "content": "Call 020 7946 0000"},
+            {"name": "Acme Plumbing", "url": "https://acme.co.uk/branch", "content": ""},
+        ]
+
+
+def make_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "OUTPUT_DIR", tmp_path / "output")
+    return TestClient(main.app)
+
+
+def test_probes_and_drain(tmp_path, monkeypatch):
+    with make_client(tmp_path, monkeypatch) as client:
+        assert client.get("/healthz").json() == {"status": "alive"}
+        assert client.get("/readyz").status_code == 200
+
+        main.app.state.context.begin_drain()
+        ready = client.get("/readyz")
+        assert ready.status_code == 503
+        assert ready.json()["draining"] is True
+        # Requests that still arrive while draining are served
+        response = client.post("/api/procurePart", json={"part_to_acquire": "pipe", "location_postcode": "E1 6AN"})
+        assert response.status_code == 200
+        assert client.get("/healthz").status_code == 200
+
+
+def test_find_stores_without_valyu_returns_503(tmp_path, monkeypatch):
+    with make_client(tmp_path, monkeypatch) as client:
+        main.app.state.context.valyu_service = None
+        response = client.post("/api/findStores", json={"part_to_acquire": "pipe", "location_postcode": "E1 6AN"})
+        assert response.status_code == 503
+
+
+def test_find_stores_reports_merged_duplicates_and_saves_results(tmp_path, monkeypatch):
+    with make_client(tmp_path, monkeypatch) as client:
+        main.app.state.context.valyu_service = FakeValyuService()
+        body = client.post("/api/findStores", json={"part_to_acquire": "pipe", "location_postcode": "E1 6AN"}).json()
+    assert body["total_stores"] == 1
+    assert body["duplicates_merged"] == 1
+    assert len(list((tmp_path / "output").glob("find_stores_*.json"))) == 1
+
+
+def test_sigterm_drains_before_forwarding_to_previous_handler():
+    forwarded = []
+
+    async def scenario():
+        context = main.AppContext(shutdown_delay=0.05)
+        context._loop = asyncio.get_running_loop()
+        context._previous_sigterm = lambda sig, frame: forwarded.append(sig)
+        context.ready = True
+
+        context._handle_sigterm(signal.SIGTERM, None)
+        assert context.draining and not context.ready
+        assert forwarded == []
+        await asyncio.sleep(0.2)
+        assert forwarded == [signal.SIGTERM]
+        await context.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_find_stores_succeeds_when_saving_results_fails(tmp_path, monkeypatch):
+    def failing_write(filepath, data):
+        raise OSError("No space left on device")
+
+    with make_client(tmp_path, monkeypatch) as client:
+        main.app.state.context.valyu_service = FakeValyuService()
+        monkeypatch.setattr(main, "_write_json", failing_write)
+        response = client.post("/api/findStores", json={"part_to_acquire": "pipe", "location_postcode": "E1 6AN"})
+    assert response.status_code == 200
+    assert response.json()["total_stores"] == 1
+
+
+def test_shutdown_finishes_queued_writes(tmp_path):
+    async def scenario():
+        context = main.AppContext(shutdown_delay=0)
+        context.executor = main.ThreadPoolExecutor(max_workers=1)
+        blocker = context.executor.submit(time.sleep, 0.1)
+        queued = [
+            context.executor.submit(main._write_json, tmp_path / f"queued_{index}.json", {"index": index})
+            for index in range(3)
+        ]
+        await context.shutdown()
+        assert blocker.done()
+        assert all(future.done() and not future.cancelled() for future in queued)
+
+    asyncio.run(scenario())
+    assert len(list(tmp_path.glob("queued_*.json"))) == 3
+
+
+def test_malformed_numeric_settings_fall_back_to_defaults(monkeypatch):
+    monkeypatch.setenv("WORKER_THREADS", "eight")
+    monkeypatch.setenv("SHUTDOWN_DELAY_SECONDS", "10s")
+    assert main._env_number("WORKER_THREADS", 8, int) == 8
+    assert main._env_number("SHUTDOWN_DELAY_SECONDS", 10.0) == 10.0
+    monkeypatch.setenv("WORKER_THREADS", "4")
+    assert main._env_number("WORKER_THREADS", 8, int) == 4
@@ -0,0 +1,124 @@
+from store_dedup import canonical_url, dedupe_stores, normalize_phone
+
+
+def store(name, url, content=""):
+    return {"name": name, "url": url, "content": content}
+
+
+def test_canonical_url_ignores_scheme_www_tracking_query_and_trailing_slash():
+    assert canonical_url("https://www.Example.co.uk/Branch/?utm_source=valyu&ref=x#top") == "example.co.uk/branch"
+    assert canonical_url("example.co.uk/branch") == "example.co.uk/branch"
+
+
+def test_canonical_url_keeps_identifying_query_parameters():
+    assert canonical_url("https://maps.google.com/?cid=111&utm_source=x") == "maps.google.com?cid=111"
+    assert canonical_url("https://maps.google.com/?cid=111") != canonical_url("https://maps.google.com/?cid=222")
+    assert canonical_url("https://shop.example/locator?store=leeds&gclid=abc") == "shop.example/locator?store=leeds"
+
+
+def test_normalize_phone_accepts_uk_formats_and_skips_other_digit_runs():
+    assert normalize_phone("Call +44 (0)20 7946 0000 today") == "02079460000"
+    assert normalize_phone("Tel: 0117 496 0123") == "01174960123"
+    assert normalize_phone("Updated 2024-01-15 10 30") is None
+    assert normalize_phone("Updated 2024-01-15 10 30, call 07700 900123") == "07700900123"
+
+
+def test_same_canonical_url_is_merged():
+    results, merged = dedupe_stores([
+        store("Acme Plumbing", "https://www.acme.co.uk/branch/"),
+        store("Acme branch page", "http://acme.co.uk/branch?ref=valyu"),
+    ])
+    assert merged == 1
+    assert results[0]["aliases"] == ["http://acme.co.uk/branch?ref=valyu"]
+
+
+def test_google_listings_with_different_cids_stay_apart():
+    results, merged = dedupe_stores([
+        store("ABC Plumbing Supplies", "https://maps.google.com/?cid=111", "Call 020 7946 0000"),
+        store("Pipes R Us Bristol", "https://maps.google.com/?cid=222", "Call 0117 496 0123"),
+    ])
+    assert merged == 0
+    assert len(results) == 2
+
+
+def test_same_url_with_conflicting_branch_phones_stays_apart():
+    _, merged = dedupe_stores([
+        store("Store locator", "https://shop.example/locator", "Leeds 0113 496 0000"),
+        store("Store locator", "https://shop.example/locator/", "York 01904 496 000"),
+    ])
+    assert merged == 0
+
+
+def test_branch_phone_on_same_host_is_merged_and_fields_combined():
+    results, merged = dedupe_stores([
+        store("Acme Plumbing Supplies", "https://acme.co.uk/branch", "Call 020 7946 0000"),
+        store("Copper pipe 15mm | Acme", "https://acme.co.uk/p/123", "Tel +44 20 7946 0000. London SW1A 1AA"),
+    ])
+    assert merged == 1
+    assert results[0]["name"] == "Acme Plumbing Supplies"
+    assert "SW1A 1AA" in results[0]["content"]
+
+
+def test_branch_phone_alone_does_not_merge_unrelated_names_on_other_hosts():
+    _, merged = dedupe_stores([
+        store("Acme Plumbing Supplies", "https://acme.co.uk", "Call 020 7946 0000"),
+        store("Directory of London trades", "https://directory.example", "020 7946 0000"),
+    ])
+    assert merged == 0
+
+
+def test_chain_helpline_does_not_merge_branches():
+    _, merged = dedupe_stores([
+        store("Screwfix Bristol", "https://www.screwfix.com/stores/bristol", "Call 03330 112 112"),
+        store("Screwfix Bath", "https://www.screwfix.com/stores/bath", "Call 03330 112 112"),
+    ])
+    assert merged == 0
+
+
+def test_date_digits_do_not_merge_unrelated_shops():
+    _, merged = dedupe_stores([
+        store("Acme Plumbing", "https://acme.co.uk", "Updated 2024-01-15 10 30"),
+        store("Pipes R Us", "https://pipes.example", "Updated 2024-01-15 10 30"),
+    ])
+    assert merged == 0
+
+
+def test_near_identical_names_are_merged_across_hosts():
+    results, merged = dedupe_stores([
+        store("ABC Plumbing Supplies", "https://abc.co.uk"),
+        store("ABC Plumbing Supplies - Google Maps", "https://maps.google.com/?cid=1"),
+    ])
+    assert merged == 1
+    assert results[0]["url"] == "https://abc.co.uk"
+
+
+def test_similar_names_with_conflicting_branch_phones_stay_apart():
+    _, merged = dedupe_stores([
+        store("Plumb Centre Bristol", "https://plumbcentre.example/bristol", "0117 496 0123"),
+        store("Plumb Centre Bristol", "https://maps.google.com/?cid=2", "0117 496 0999"),
+    ])
+    assert merged == 0
+
+
+def test_identical_chain_titles_with_different_postcodes_stay_apart():
+    _, merged = dedupe_stores([
+        store("City Plumbing | Branch Finder", "https://cityplumbing.example/branch/leeds", "Leeds LS9 0AA"),
+        store("City Plumbing | Branch Finder", "https://cityplumbing.example/branch/york", "York YO1 7AA"),
+    ])
+    assert merged == 0
+
+
+def test_generic_names_on_other_hosts_with_different_postcodes_stay_apart():
+    _, merged = dedupe_stores([
+        store("Plumbing Supplies", "https://leeds-plumbing.example", "Leeds LS9 0AA"),
+        store("Plumbing Supplies Ltd", "https://york-plumbing.example", "York YO1 7AA"),
+    ])
+    assert merged == 0
+
+
+def test_same_postcode_with_different_spacing_still_merges_by_name():
+    _, merged = dedupe_stores([
+        store("ABC Plumbing Supplies", "https://abc.co.uk", "1 High St, London SW1A 1AA"),
+        store("ABC Plumbing Supplies - Google Maps", "https://maps.google.com/?cid=1", "London sw1a1aa"),
+    ])
+    assert merged == 1
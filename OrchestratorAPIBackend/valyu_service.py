@@ -2,11 +2,14 @@
 Valyu search service for finding stores near a location.
 Extracted from TradesAgent project.
 """
+import logging
 import os
 import re
 from typing import List, Optional, TypedDict
 from dotenv import load_dotenv
 
+from store_dedup import dedupe_stores
+
 load_dotenv()
 
 try:
@@ -14,12 +17,15 @@ try:
 except ImportError:
     ValyuClient = None
 
+logger = logging.getLogger(__name__)
+
 
 class StoreResult(TypedDict, total=False):
     """Single store search result from Valyu"""
     name: str
     url: str
     content: str
+    aliases: List[str]
 
 
 class ValyuSearchService:
@@ -74,7 +80,8 @@ class ValyuSearchService:
         self,
         part_to_acquire: str,
         location_postcode: str,
-        max_results: int = 10
+        max_results: int = 10,
+        dedupe: bool = True
     ) -> List[StoreResult]:
         """
         Search for stores selling a specific part near a UK postcode.
@@ -83,9 +90,11 @@ class ValyuSearchService:
             part_to_acquire: Item/part to search for
             location_postcode: UK postcode for location
             max_results: Maximum number of results to return (default: 10)
+            dedupe: Merge results that refer to the same store (default: True)
 
         Returns:
-            List of store results with name, url, and content
+            List of store results with name, url, and content.
+            Merged results list the other URLs for the store in aliases.
 
         Raises:
             ValueError: If inputs are invalid
@@ -139,4 +148,9 @@ class ValyuSearchService:
                 "content": content
             })
 
+        if dedupe:
+            results, merged = dedupe_stores(results)
+            if merged:
+                logger.info(f"Merged {merged} duplicate store results; saved {merged} scrapes/calls")
+
         return results
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import codecs
 import json
 import os
 import re
-from typing import Any, Dict, List, Optional, TypedDict
+import time
+from typing import Any, Callable, Dict, List, Optional, TypedDict
 from urllib import error, request
 
 from dotenv import load_dotenv
 from langgraph.graph import END, START, StateGraph
 
+from OrchestratorAPIBackend.store_dedup import canonical_url, dedupe_stores
+
 load_dotenv()
 
 try:
@@ -21,6 +25,7 @@ class ShopCandidate(TypedDict, total=False):
     name: str
     url: str
     content: str
+    aliases: List[str]
 
 
 class ShopContact(TypedDict, total=False):
@@ -35,10 +40,16 @@ class AgentState(TypedDict, total=False):
     location: str
     shops: List[ShopCandidate]
     final_results: List[ShopContact]
+    stats: Dict[str, int]
 
 
 UK_POSTCODE_PATTERN = re.compile(r"^(GIR ?0AA|[A-Z]{1,2}\d{1,2}[A-Z]?\s*\d[A-Z]{2})$", re.IGNORECASE)
+POSTCODE_SEARCH_PATTERN = re.compile(r"\b(GIR ?0AA|[A-Z]{1,2}\d{1,2}[A-Z]?\s*\d[A-Z]{2})\b", re.IGNORECASE)
 PHONE_PATTERN = re.compile(r"(\+?\d[\d\s().-]{7,}\d)")
+CONTACT_FIELDS = ("phone", "address")
+CONTACT_MATCH_GUARD = 16
+CONTACT_KB_PATH = os.getenv("CONTACT_KB_PATH", "contact_knowledge.json")
+DEFAULT_CONTACT_TTL_DAYS = 30
 
 
 def is_valid_uk_postcode(value: str) -> bool:
@@ -59,7 +70,7 @@ def extract_phone_number(texts: List[str]) -> Optional[str]:
 def extract_address(text: str) -> Optional[str]:
     if not text:
         return None
-    match = UK_POSTCODE_PATTERN.search(text)
+    match = POSTCODE_SEARCH_PATTERN.search(text)
     if not match:
         return None
     start = max(0, match.start() - 80)
@@ -68,6 +79,63 @@ def extract_address(text: str) -> Optional[str]:
     return snippet if snippet else None
 
 
+class ContactKnowledgeBase:
+    def __init__(self, path: str = CONTACT_KB_PATH, ttl_seconds: Optional[int] = None) -> None:
+        self.path = path
+        if ttl_seconds is None:
+            try:
+                ttl_days = float(os.getenv("CONTACT_TTL_DAYS", DEFAULT_CONTACT_TTL_DAYS))
+            except ValueError:
+                ttl_days = DEFAULT_CONTACT_TTL_DAYS
+            ttl_seconds = int(ttl_days * 24 * 60 * 60)
+        self.ttl_seconds = ttl_seconds
+        self.entries: Dict[str, Dict[str, Dict[str, Any]]] = self._load()
+        self.dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def lookup(self, url: str, now: Optional[float] = None) -> Dict[str, str]:
+        key = canonical_url(url)
+        if not key:
+            return {}
+        now = time.time() if now is None else now
+        known: Dict[str, str] = {}
+        for field, record in self.entries.get(key, {}).items():
+            if not isinstance(record, dict):
+                continue
+            value = record.get("value")
+            updated_at = record.get("updated_at", 0)
+            if value and now - updated_at <= self.ttl_seconds:
+                known[field] = value
+        return known
+
+    def record(self, url: str, fields: Dict[str, Optional[str]], now: Optional[float] = None) -> None:
+        key = canonical_url(url)
+        if not key:
+            return
+        now = time.time() if now is None else now
+        entry = self.entries.setdefault(key, {})
+        for field, value in fields.items():
+            if value:
+                entry[field] = {"value": value, "updated_at": now}
+                self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(self.entries, handle, indent=2)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
 class ValyuSearchClient:
     def __init__(self) -> None:
         self.client = None
@@ -102,16 +170,120 @@ class ValyuSearchClient:
         return results
 
 
+def contact_stop_predicate(missing_fields: List[str]) -> Callable[[str], bool]:
+    pending = set(missing_fields)
+    patterns = {"phone": PHONE_PATTERN, "address": POSTCODE_SEARCH_PATTERN}
+
+    def found_all(text: str) -> bool:
+        # A match ending near the end of the window may be cut off by the chunk
+        # boundary ("020 7946 0|000"), so it only counts once more text follows it
+        limit = len(text) - CONTACT_MATCH_GUARD
+        for field in list(pending):
+            match = patterns[field].search(text)
+            if match and match.end() <= limit:
+                pending.discard(field)
+        return not pending
+
+    return found_all
+
+
+class JsonFieldStream:
+    TOKEN_PATTERN = re.compile(
+        r'[^"\\]+'
+        r"|\\u[dD][89abAB][0-9a-fA-F]{2}\\u[0-9a-fA-F]{4}"
+        r"|\\u(?![dD][89abAB])[0-9a-fA-F]{4}"
+        r"|\\[^u]"
+        r'|"'
+    )
+    MARKER_OVERLAP = 64
+
+    def __init__(self, key: str) -> None:
+        self._marker = re.compile(r'"%s"\s*:\s*"' % re.escape(key))
+        self._decoder = codecs.getincrementaldecoder("utf-8")("ignore")
+        self._pending = ""
+        self._search_from = 0
+        self.head = ""
+        self.parts: List[str] = []
+        self.started = False
+        self.finished = False
+
+    @property
+    def value(self) -> str:
+        return "".join(self.parts)
+
+    def feed(self, chunk: bytes) -> str:
+        text = self._decoder.decode(chunk)
+        if self.finished:
+            return ""
+        if not self.started:
+            self.head += text
+            match = self._marker.search(self.head, self._search_from)
+            if not match:
+                self._search_from = max(0, len(self.head) - self.MARKER_OVERLAP)
+                return ""
+            self.started = True
+            text = self.head[match.end() :]
+            self.head = ""
+        return self._consume(self._pending + text)
+
+    def _consume(self, text: str) -> str:
+        decoded: List[str] = []
+        position = 0
+        while position < len(text):
+            token = self.TOKEN_PATTERN.match(text, position)
+            if not token:
+                break
+            value = token.group(0)
+            position = token.end()
+            if value == '"':
+                self.finished = True
+                break
+            decoded.append(json.loads(f'"{value}"') if value.startswith("\\") else value)
+        self._pending = "" if self.finished else text[position:]
+        fresh = "".join(decoded)
+        self.parts.append(fresh)
+        return fresh
+
+
 class FirecrawlScraper:
     BASE_URL = "https://api.firecrawl.dev/v1/scrape"
+    CHUNK_SIZE = 16 * 1024
+    CONTACT_TAGS = ["footer", "address", "#contact", ".contact", "[class*=contact]", "[id*=contact]"]
 
-    def __init__(self) -> None:
-        self.api_key = os.getenv("FIRECRAWL_API_KEY")
+    DEFAULT_MAX_BYTES = 512 * 1024
 
-    def scrape_text(self, url: str) -> str:
+    def __init__(
+        self,
+        lean: Optional[bool] = None,
+        max_bytes: Optional[int] = None,
+        contact_sections: Optional[bool] = None,
+    ) -> None:
+        self.api_key = os.getenv("FIRECRAWL_API_KEY")
+        self.lean = os.getenv("FIRECRAWL_LEAN", "1") != "0" if lean is None else lean
+        if max_bytes is None:
+            try:
+                max_bytes = int(os.getenv("FIRECRAWL_MAX_BYTES", self.DEFAULT_MAX_BYTES))
+            except ValueError:
+                max_bytes = self.DEFAULT_MAX_BYTES
+        self.max_bytes = max_bytes
+        if contact_sections is None:
+            contact_sections = os.getenv("FIRECRAWL_CONTACT_SECTIONS", "0") == "1"
+        self.contact_sections = contact_sections
+        self.bytes_transferred = 0
+
+    def _build_payload(self, url: str) -> Dict[str, Any]:
+        if not self.lean:
+            return {"url": url, "formats": ["markdown", "html"]}
+        payload: Dict[str, Any] = {"url": url, "formats": ["markdown"]}
+        if self.contact_sections:
+            payload["onlyMainContent"] = False
+            payload["includeTags"] = self.CONTACT_TAGS
+        return payload
+
+    def scrape_text(self, url: str, stop_when: Optional[Callable[[str], bool]] = None) -> str:
         if not self.api_key:
             return ""
-        payload = json.dumps({"url": url, "formats": ["markdown", "html"]}).encode("utf-8")
+        payload = json.dumps(self._build_payload(url)).encode("utf-8")
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"ApiKey key={self.api_key}",
@@ -119,9 +291,39 @@ class FirecrawlScraper:
         req = request.Request(self.BASE_URL, data=payload, headers=headers, method="POST")
         try:
             with request.urlopen(req, timeout=20) as resp:
-                body = resp.read().decode("utf-8")
+                if self.lean:
+                    return self._read_lean(resp, stop_when)
+                body = resp.read()
+                self.bytes_transferred += len(body)
         except error.URLError:
             return ""
+        return self._parse_body(body.decode("utf-8"))
+
+    def _read_lean(self, resp: Any, stop_when: Optional[Callable[[str], bool]]) -> str:
+        stream = JsonFieldStream("markdown")
+        received = 0
+        complete = False
+        overlap = ""
+        while received < self.max_bytes and not stream.finished:
+            chunk = resp.read(min(self.CHUNK_SIZE, self.max_bytes - received))
+            if not chunk:
+                complete = True
+                break
+            received += len(chunk)
+            fresh = stream.feed(chunk)
+            if stop_when is not None and fresh:
+                window = overlap + fresh
+                if stop_when(window):
+                    break
+                overlap = window[-JsonFieldStream.MARKER_OVERLAP :]
+        self.bytes_transferred += received
+        if stream.started:
+            return stream.value
+        if complete:
+            return self._parse_body(stream.head)
+        return ""
+
+    def _parse_body(self, body: str) -> str:
         try:
             response = json.loads(body)
         except json.JSONDecodeError:
@@ -143,6 +345,7 @@ class FirecrawlScraper:
 
 VALYU_CLIENT = ValyuSearchClient()
 FIRECRAWL_SCRAPER = FirecrawlScraper()
+CONTACT_KB = ContactKnowledgeBase()
 
 
 def search_shops(state: AgentState) -> AgentState:
@@ -159,31 +362,58 @@ def search_shops(state: AgentState) -> AgentState:
     return next_state
 
 
+def dedupe_shops(state: AgentState) -> AgentState:
+    shops = state.get("shops", [])
+    deduped, merged = dedupe_stores(shops)
+    next_state = dict(state)
+    next_state["shops"] = deduped
+    next_state["stats"] = {**state.get("stats", {}), "duplicates_merged": merged}
+    return next_state
+
+
 def extract_contact_info(state: AgentState) -> AgentState:
     shops = state.get("shops", [])
     results: List[ShopContact] = []
+    stats = {**state.get("stats", {}), "scrapes": 0, "kb_hits": 0}
+    bytes_before = FIRECRAWL_SCRAPER.bytes_transferred
     for candidate in shops:
+        url = candidate.get("url", "")
+        known = CONTACT_KB.lookup(url) if url else {}
+        if all(known.get(field) for field in CONTACT_FIELDS):
+            stats["kb_hits"] += 1
         texts = [candidate.get("content", "")]
-        phone = extract_phone_number(texts)
-        address = extract_address(texts[0] if texts else "")
-        if (not phone or not address) and candidate.get("url"):
-            scraped = FIRECRAWL_SCRAPER.scrape_text(candidate["url"])
+        found: Dict[str, Optional[str]] = {}
+        if not known.get("phone"):
+            found["phone"] = extract_phone_number(texts)
+        if not known.get("address"):
+            found["address"] = extract_address(texts[0] if texts else "")
+        phone = known.get("phone") or found.get("phone")
+        address = known.get("address") or found.get("address")
+        if (not phone or not address) and url:
+            missing = [field for field, value in (("phone", phone), ("address", address)) if not value]
+            scraped = FIRECRAWL_SCRAPER.scrape_text(url, stop_when=contact_stop_predicate(missing))
+            stats["scrapes"] += 1
             if scraped:
                 texts.append(scraped)
                 if not phone:
-                    phone = extract_phone_number(texts)
+                    phone = found["phone"] = extract_phone_number(texts)
                 if not address:
-                    address = extract_address(scraped)
+                    address = found["address"] = extract_address(scraped)
+        if url:
+            CONTACT_KB.record(url, found)
         results.append(
             {
                 "name": candidate.get("name", ""),
                 "phone": phone,
                 "address": address,
-                "url": candidate.get("url", ""),
+                "url": url,
             }
         )
+    CONTACT_KB.save()
+    stats["scrape_bytes"] = FIRECRAWL_SCRAPER.bytes_transferred - bytes_before
     next_state = dict(state)
     next_state["final_results"] = results
+    next_state["stats"] = stats
     return next_state
 
 
@@ -196,10 +426,12 @@ def save_results(state: AgentState) -> AgentState:
 
 graph = StateGraph(AgentState)
 graph.add_node("search", search_shops)
+graph.add_node("dedupe", dedupe_shops)
 graph.add_node("extract", extract_contact_info)
 graph.add_node("save", save_results)
 graph.add_edge(START, "search")
-graph.add_edge("search", "extract")
+graph.add_edge("search", "dedupe")
+graph.add_edge("dedupe", "extract")
 graph.add_edge("extract", "save")
 graph.add_edge("save", END)
 workflow = graph.compile()
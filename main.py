@@ -1,4 +1,5 @@
 import argparse
+import tracemalloc
 
 from agent import run_agent
 
@@ -12,9 +13,16 @@ def parse_args() -> argparse.Namespace:
 
 def main() -> None:
     args = parse_args()
+    tracemalloc.start()
     state = run_agent(args.item, args.location)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
     results = state.get("final_results", [])
+    stats = state.get("stats", {})
     print(f"Saved {len(results)} shop entries to plumbing_shops.json")
+    print(f"Scrapes: {stats.get('scrapes', 0)}, fully known from contact cache: {stats.get('kb_hits', 0)}")
+    print(f"Duplicate results merged (scrapes and calls saved): {stats.get('duplicates_merged', 0)}")
+    print(f"Scrape bytes transferred: {stats.get('scrape_bytes', 0)}, peak memory during run: {peak_bytes / (1024 * 1024):.1f} MB")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import re
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"TASNAP1\n"
+HEADER_LENGTH = struct.Struct("<I")
+OFFSET = struct.Struct("<q")
+OFFSET_PAIR = struct.Struct("<qq")
+POSTCODE_SEARCH_PATTERN = re.compile(r"\b(GIR ?0AA|[A-Z]{1,2}\d{1,2}[A-Z]?\s*\d[A-Z]{2})\b", re.IGNORECASE)
+
+DATASETS: Dict[str, Dict[str, Any]] = {
+    "contacts": {
+        "columns": ("name", "phone", "address", "url"),
+        "json_columns": (),
+        "postcode_fields": ("address",),
+        "glob": "plumbing_shops*.json",
+        "marker": "url",
+    },
+    "stores": {
+        "columns": ("name", "url", "content", "aliases", "location_postcode"),
+        "json_columns": ("aliases",),
+        "postcode_fields": ("location_postcode", "content"),
+        "glob": "find_stores_*.json",
+        "marker": "url",
+    },
+    "requests": {
+        "columns": ("timestamp", "part_to_acquire", "location_postcode"),
+        "json_columns": (),
+        "postcode_fields": ("location_postcode",),
+        "glob": "procure_part_*.json",
+        "marker": "part_to_acquire",
+    },
+}
+
+
+def postcode_area(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    match = POSTCODE_SEARCH_PATTERN.search(value)
+    if not match:
+        return ""
+    return re.match(r"[A-Z]+", match.group(1).upper()).group(0)
+
+
+def record_area(dataset: str, record: Dict[str, Any]) -> str:
+    for field in DATASETS[dataset]["postcode_fields"]:
+        area = postcode_area(record.get(field))
+        if area:
+            return area
+    return ""
+
+
+def load_json_records(dataset: str, source: Path) -> List[Dict[str, Any]]:
+    paths = sorted(source.glob(DATASETS[dataset]["glob"])) if source.is_dir() else [source]
+    marker = DATASETS[dataset]["marker"]
+    records: List[Dict[str, Any]] = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        if dataset == "stores":
+            # Saved findStores responses: the stores list plus the searched postcode
+            if not (isinstance(data, dict) and isinstance(data.get("stores"), list)):
+                continue
+            postcode = data.get("location_postcode")
+            data = [{**store, "location_postcode": store.get("location_postcode") or postcode} for store in data["stores"]]
+        elif isinstance(data, dict):
+            data = [data.get("data", data) if dataset == "requests" else data]
+        records.extend(item for item in data if isinstance(item, dict) and marker in item)
+    return records
+
+
+def unknown_fields(dataset: str, records: List[Dict[str, Any]]) -> List[str]:
+    columns = set(DATASETS[dataset]["columns"])
+    return sorted({key for record in records for key in record} - columns)
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(dataset: str, records: List[Dict[str, Any]], target: Path) -> Dict[str, Any]:
+    columns = DATASETS[dataset]["columns"]
+    json_columns = DATASETS[dataset]["json_columns"]
+    areas = [record_area(dataset, record) for record in records]
+    order = sorted(range(len(records)), key=lambda index: areas[index])
+    area_ranges: Dict[str, List[int]] = {}
+    for position, index in enumerate(order):
+        area_ranges.setdefault(areas[index], [position, position])[1] = position + 1
+
+    blocks: List[bytes] = []
+    layout: List[Dict[str, Any]] = []
+    offset = 0
+
+    def add_block(data: bytes) -> List[int]:
+        nonlocal offset
+        padding = -len(data) % 8
+        blocks.append(data + b"\0" * padding)
+        span = [offset, len(data)]
+        offset += len(data) + padding
+        return span
+
+    for name in columns:
+        offsets = array("q", [0])
+        nulls = bytearray()
+        data = bytearray()
+        for index in order:
+            value = records[index].get(name)
+            nulls.append(value is None)
+            if value is not None:
+                encoded = json.dumps(value, separators=(",", ":")) if name in json_columns else str(value)
+                data += encoded.encode("utf-8")
+            offsets.append(len(data))
+        layout.append(
+            {
+                "name": name,
+                "json": name in json_columns,
+                "offsets": add_block(_little_endian(offsets)),
+                "nulls": add_block(bytes(nulls)),
+                "data": add_block(bytes(data)),
+            }
+        )
+
+    header = {
+        "version": 1,
+        "dataset": dataset,
+        "rows": len(records),
+        "columns": layout,
+        "areas": area_ranges,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    prefix_length = len(MAGIC) + HEADER_LENGTH.size + len(header_bytes)
+    header_bytes += b" " * (-prefix_length % 8)
+    with open(target, "wb") as handle:
+        handle.write(MAGIC)
+        handle.write(HEADER_LENGTH.pack(len(header_bytes)))
+        handle.write(header_bytes)
+        for block in blocks:
+            handle.write(block)
+    return header
+
+
+class SnapshotReader:
+    def __init__(self, path: Path) -> None:
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a snapshot file.")
+        (header_length,) = HEADER_LENGTH.unpack_from(self._map, len(MAGIC))
+        header_start = len(MAGIC) + HEADER_LENGTH.size
+        self.header: Dict[str, Any] = json.loads(self._map[header_start : header_start + header_length])
+        self._base = header_start + header_length
+        self._columns = {column["name"]: column for column in self.header["columns"]}
+
+    def __enter__(self) -> SnapshotReader:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.header["rows"]
+
+    @property
+    def dataset(self) -> str:
+        return self.header["dataset"]
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self._columns)
+
+    def areas(self) -> Dict[str, int]:
+        return {area: end - start for area, (start, end) in self.header["areas"].items()}
+
+    def _row_range(self, area: Optional[str]) -> Tuple[int, int]:
+        if area is None:
+            return 0, len(self)
+        start, end = self.header["areas"].get(area.strip().upper(), (0, 0))
+        return start, end
+
+    def _block(self, span: List[int]) -> memoryview:
+        start = self._base + span[0]
+        return memoryview(self._map)[start : start + span[1]]
+
+    def column(self, name: str, area: Optional[str] = None) -> List[Any]:
+        layout = self._columns[name]
+        is_json = layout.get("json", False)
+        start, end = self._row_range(area)
+        offsets = self._block(layout["offsets"])
+        nulls = self._block(layout["nulls"])
+        data = self._block(layout["data"])
+        values: List[Any] = []
+        try:
+            for row in range(start, end):
+                if nulls[row]:
+                    values.append(None)
+                    continue
+                low, high = OFFSET_PAIR.unpack_from(offsets, row * OFFSET.size)
+                text = str(data[low:high], "utf-8")
+                values.append(json.loads(text) if is_json else text)
+        finally:
+            for view in (offsets, nulls, data):
+                view.release()
+        return values
+
+    def rows(self, area: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        names = self.column_names
+        columns = [self.column(name, area) for name in names]
+        for values in zip(*columns):
+            yield dict(zip(names, values))
+
+    def close(self) -> None:
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Convert store and contact JSON outputs to compact snapshots and back.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Convert JSON output files to a snapshot.")
+    export.add_argument("dataset", choices=sorted(DATASETS), help="Dataset schema of the JSON source.")
+    export.add_argument(
+        "source",
+        type=Path,
+        help="JSON file, or directory of JSON files (e.g. output/; only files matching the dataset's name pattern are read).",
+    )
+    export.add_argument("target", type=Path, help="Snapshot file to write.")
+    restore = commands.add_parser("import", help="Convert a snapshot back to JSON.")
+    restore.add_argument("source", type=Path, help="Snapshot file to read.")
+    restore.add_argument("target", type=Path, help="JSON file to write.")
+    restore.add_argument("--area", help="Only rows in this postcode area (e.g. SW).")
+    info = commands.add_parser("info", help="Show snapshot row counts per postcode area.")
+    info.add_argument("source", type=Path, help="Snapshot file to read.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.command == "export":
+        records = load_json_records(args.dataset, args.source)
+        dropped = unknown_fields(args.dataset, records)
+        if dropped:
+            print(f"Warning: fields not in the {args.dataset} schema are not exported: {', '.join(dropped)}")
+        write_snapshot(args.dataset, records, args.target)
+        print(f"Wrote {len(records)} {args.dataset} rows to {args.target}")
+        return
+    with SnapshotReader(args.source) as reader:
+        if args.command == "info":
+            print(f"{reader.dataset}: {len(reader)} rows")
+            for area, count in sorted(reader.areas().items()):
+                print(f"  {area or '(none)'}: {count}")
+            return
+        rows = list(reader.rows(args.area))
+    with open(args.target, "w", encoding="utf-8") as handle:
+        json.dump(rows, handle, indent=2)
+    print(f"Wrote {len(rows)} rows to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import agent
+
+
+class RecordingScraper:
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.calls = []
+        self.bytes_transferred = 0
+
+    def scrape_text(self, url, stop_when=None):
+        self.calls.append(url)
+        return self.text
+
+
+def test_extract_address_finds_postcode_inside_text():
+    address = agent.extract_address("Acme, 1 High St, London SW1A 1AA. Open daily")
+    assert address is not None
+    assert "SW1A 1AA" in address
+
+
+def test_second_run_with_known_shops_makes_zero_scrapes(tmp_path, monkeypatch):
+    scraper = RecordingScraper("Call 020 7946 0000. Acme, 1 High St, London SW1A 1AA")
+    monkeypatch.setattr(agent, "FIRECRAWL_SCRAPER", scraper)
+    state = {
+        "shops": [
+            {"name": "Acme", "url": "https://www.acme.co.uk/branch/", "content": "Plumbing supplies"},
+            {"name": "Pipes R Us", "url": "https://pipes.example/", "content": "Copper pipe stockist"},
+        ]
+    }
+
+    monkeypatch.setattr(agent, "CONTACT_KB", agent.ContactKnowledgeBase(path=str(tmp_path / "kb.json")))
+    first = agent.extract_contact_info(state)
+    assert len(scraper.calls) == 2
+    assert all(result["phone"] and result["address"] for result in first["final_results"])
+
+    monkeypatch.setattr(agent, "CONTACT_KB", agent.ContactKnowledgeBase(path=str(tmp_path / "kb.json")))
+    second = agent.extract_contact_info(state)
+    assert len(scraper.calls) == 2
+    assert second["stats"]["scrapes"] == 0
+    assert second["stats"]["kb_hits"] == 2
+    assert second["final_results"] == first["final_results"]
+
+
+def test_stale_fields_are_scraped_again(tmp_path, monkeypatch):
+    scraper = RecordingScraper("Call 020 7946 0000. Acme, 1 High St, London SW1A 1AA")
+    monkeypatch.setattr(agent, "FIRECRAWL_SCRAPER", scraper)
+    kb = agent.ContactKnowledgeBase(path=str(tmp_path / "kb.json"), ttl_seconds=60)
+    kb.record("https://acme.co.uk/branch", {"phone": "020 7946 0000", "address": "London SW1A 1AA"}, now=0)
+    monkeypatch.setattr(agent, "CONTACT_KB", kb)
+
+    result = agent.extract_contact_info({"shops": [{"name": "Acme", "url": "https://acme.co.uk/branch", "content": ""}]})
+    assert len(scraper.calls) == 1
+    assert result["stats"]["scrapes"] == 1
+
+
+def test_contact_cache_keeps_listings_with_different_query_ids_apart(tmp_path):
+    kb = agent.ContactKnowledgeBase(path=str(tmp_path / "kb.json"))
+    kb.record("https://maps.google.com/?cid=111", {"phone": "020 7946 0000", "address": "London SW1A 1AA"})
+    assert kb.lookup("https://maps.google.com/?cid=222") == {}
+    assert kb.lookup("https://www.maps.google.com/?cid=111&utm_source=x")["phone"] == "020 7946 0000"
+
+
+def test_invalid_ttl_env_falls_back_to_default(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONTACT_TTL_DAYS", "thirty")
+    kb = agent.ContactKnowledgeBase(path=str(tmp_path / "kb.json"))
+    assert kb.ttl_seconds == agent.DEFAULT_CONTACT_TTL_DAYS * 24 * 60 * 60
+
+
+class ChunkedResponse:
+    def __init__(self, body: bytes, chunk_size: int) -> None:
+        self.body = body
+        self.chunk_size = chunk_size
+        self.position = 0
+
+    def read(self, size: int) -> bytes:
+        size = min(size, self.chunk_size)
+        chunk = self.body[self.position : self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+
+def firecrawl_body(markdown: str) -> bytes:
+    return agent.json.dumps({"success": True, "data": {"markdown": markdown, "metadata": {"title": "x"}}}).encode("utf-8")
+
+
+def test_json_field_stream_decodes_split_escapes_and_multibyte_text():
+    markdown = 'Café "quoted" \\ back\nslash \U0001F527 tab\there' * 3
+    for ensure_ascii in (True, False):
+        body = agent.json.dumps({"data": {"markdown": markdown}}, ensure_ascii=ensure_ascii).encode("utf-8")
+        stream = agent.JsonFieldStream("markdown")
+        for index in range(len(body)):
+            stream.feed(body[index : index + 1])
+        assert stream.finished
+        assert stream.value == markdown
+
+
+def test_lean_read_stops_once_missing_fields_are_found():
+    markdown = "intro " * 5000 + "Call 020 7946 0000, 1 High St, London SW1A 1AA\n" + "tail " * 100000
+    body = firecrawl_body(markdown)
+    scraper = agent.FirecrawlScraper(lean=True, max_bytes=len(body))
+    text = scraper._read_lean(ChunkedResponse(body, 4096), agent.contact_stop_predicate(["phone", "address"]))
+    assert "SW1A 1AA" in text
+    assert scraper.bytes_transferred < len(body) // 10
+
+
+def test_lean_read_only_waits_for_fields_still_missing():
+    markdown = "Call 020 7946 0000 " + "filler " * 20000 + "London SW1A 1AA"
+    body = firecrawl_body(markdown)
+    scraper = agent.FirecrawlScraper(lean=True, max_bytes=len(body))
+    scraper._read_lean(ChunkedResponse(body, 4096), agent.contact_stop_predicate(["phone"]))
+    assert scraper.bytes_transferred < len(body) // 10
+
+
+def test_lean_read_respects_size_cap_and_falls_back_to_full_parse():
+    body = firecrawl_body("x" * 100000)
+    scraper = agent.FirecrawlScraper(lean=True, max_bytes=10000)
+    assert len(scraper._read_lean(ChunkedResponse(body, 4096), None)) < 10000
+    assert scraper.bytes_transferred == 10000
+    other = agent.json.dumps({"success": True, "content": "plain content"}).encode("utf-8")
+    assert agent.FirecrawlScraper(lean=True)._read_lean(ChunkedResponse(other, 7), None) == "plain content"
+
+
+class SplitResponse(ChunkedResponse):
+    def __init__(self, body: bytes, split_at: int, chunk_size: int) -> None:
+        super().__init__(body, chunk_size)
+        self.split_at = split_at
+
+    def read(self, size: int) -> bytes:
+        if self.position < self.split_at:
+            size = min(size, self.split_at - self.position)
+        return super().read(size)
+
+
+def test_lean_read_does_not_stop_on_number_cut_by_chunk_boundary():
+    markdown = "Acme, London SW1A 1AA. Call 020 7946 0000 for stock." + " filler" * 5000
+    body = firecrawl_body(markdown)
+    split_at = body.index(b"020 7946 0") + len(b"020 7946 0")
+    scraper = agent.FirecrawlScraper(lean=True, max_bytes=len(body))
+    text = scraper._read_lean(SplitResponse(body, split_at, 4096), agent.contact_stop_predicate(["phone", "address"]))
+    assert agent.extract_phone_number([text]) == "020 7946 0000"
+    assert scraper.bytes_transferred < len(body)
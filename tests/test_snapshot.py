@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import snapshot
+
+
+CONTACTS = [
+    {"name": "Acme", "phone": "020 7946 0000", "address": "1 High St, London SW1A 1AA", "url": "https://acme.co.uk"},
+    {"name": "Café Pipes", "phone": None, "address": "2 Low Rd, Bristol BS1 4DJ", "url": "https://pipes.example"},
+    {"name": "Nowhere", "phone": None, "address": None, "url": ""},
+    {"name": "Westminster Taps", "phone": "020 7946 0001", "address": "London SW1P 3BU", "url": "https://taps.example"},
+]
+
+
+def write_json(path, data):
+    path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    return path
+
+
+def test_contacts_round_trip(tmp_path):
+    target = tmp_path / "contacts.snap"
+    snapshot.write_snapshot("contacts", CONTACTS, target)
+    with snapshot.SnapshotReader(target) as reader:
+        assert reader.dataset == "contacts"
+        assert len(reader) == len(CONTACTS)
+        assert reader.areas() == {"": 1, "BS": 1, "SW": 2}
+        rows = list(reader.rows())
+    key = lambda row: row["name"]
+    assert sorted(rows, key=key) == sorted(CONTACTS, key=key)
+
+
+def test_area_filter_reads_only_matching_rows(tmp_path):
+    target = tmp_path / "contacts.snap"
+    snapshot.write_snapshot("contacts", CONTACTS, target)
+    with snapshot.SnapshotReader(target) as reader:
+        assert {row["name"] for row in reader.rows("sw")} == {"Acme", "Westminster Taps"}
+        assert reader.column("name", "BS") == ["Café Pipes"]
+        assert list(reader.rows("ZZ")) == []
+
+
+def test_empty_snapshot_round_trip(tmp_path):
+    target = tmp_path / "empty.snap"
+    snapshot.write_snapshot("requests", [], target)
+    with snapshot.SnapshotReader(target) as reader:
+        assert len(reader) == 0
+        assert list(reader.rows()) == []
+
+
+def test_rejects_non_snapshot_files(tmp_path):
+    path = write_json(tmp_path / "plumbing_shops.json", CONTACTS)
+    with pytest.raises(ValueError):
+        snapshot.SnapshotReader(path)
+
+
+def test_stores_export_skips_request_files_and_keeps_aliases(tmp_path):
+    output = tmp_path / "output"
+    output.mkdir()
+    write_json(
+        output / "procure_part_20250101_000000_000000.json",
+        {"timestamp": "2025-01-01T00:00:00", "part_to_acquire": "copper pipe", "location_postcode": "E1 6AN"},
+    )
+    write_json(
+        output / "find_stores_20250101_000000_000000.json",
+        {
+            "status": "success",
+            "location_postcode": "E1 6AN",
+            "stores": [
+                {"name": "Acme", "url": "https://acme.co.uk", "content": "Call us", "aliases": ["https://maps.example/1"]},
+                {"name": "Pipes", "url": "https://pipes.example", "content": "", "aliases": []},
+            ],
+        },
+    )
+
+    stores = snapshot.load_json_records("stores", output)
+    requests = snapshot.load_json_records("requests", output)
+    assert [store["name"] for store in stores] == ["Acme", "Pipes"]
+    assert len(requests) == 1
+    assert snapshot.unknown_fields("stores", stores) == []
+
+    target = tmp_path / "stores.snap"
+    snapshot.write_snapshot("stores", stores, target)
+    with snapshot.SnapshotReader(target) as reader:
+        rows = list(reader.rows("E"))
+    assert rows == stores
+    assert rows[0]["aliases"] == ["https://maps.example/1"]
+
+
+def test_unknown_fields_are_reported(tmp_path):
+    records = [{**CONTACTS[0], "rating": 5}]
+    assert snapshot.unknown_fields("contacts", records) == ["rating"]